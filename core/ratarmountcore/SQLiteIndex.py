@@ -1,4 +1,5 @@
 import contextlib
+import functools
 import json
 import logging
 import os
@@ -923,10 +924,25 @@ class SQLiteIndex:
         # posixpath.normpath does not delete duplicate '/' at beginning of string!
         # posixpath.normpath can remove suffixed folder/./ path specifications but it can't remove
         # a leading dot that's why we prefix a leading slash also before calling normpath.
+        # Most paths are already normalized, e.g., when they were created by us. These can be returned as is.
+        if (
+            path
+            and path[0] == '/'
+            and path[-1] != '/'
+            and '//' not in path
+            and '/./' not in path
+            and '/../' not in path
+            and not path.endswith(('/.', '/..'))
+        ):
+            return path
         return '/' + posixpath.normpath('/' + path).lstrip('/')
 
     @staticmethod
+    @functools.lru_cache(maxsize=4096)
     def _query_normpath(path: str):
+        # Memoized because the same paths get queried over and over again, e.g., by FUSE, which calls getattr
+        # for all parent folders. Note that normpath is not memoized because it is mostly called with new paths
+        # while creating the index.
         # posixpath.normpath also collapses /../ into / and, because we prepend /, ../ gets collapsed to /.
         # Note that normpath does not collapse leading double slash, but all other number of leading slashes!
         # This effect is good to have for inserting rows but not for querying rows.
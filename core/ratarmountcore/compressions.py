@@ -16,9 +16,6 @@ from .utils import (
     HEX,
     CompressionError,
     format_number,
-    is_latin_alpha,
-    is_latin_digit,
-    is_latin_hex_alpha,
     is_on_slow_drive,
 )
 
@@ -185,36 +182,65 @@ def find_available_backend(
     return None
 
 
-def strip_suffix_from_compressed_file(path: str) -> str:
-    """Strips compression suffixes like .bz2, .gz, ..."""
-    for formatInfo in COMPRESSION_FORMATS.values():
-        for extension in formatInfo.extensions:
-            if path.lower().endswith('.' + extension.lower()):
-                return path[: -(len(extension) + 1)]
-    return path
+def _group_by_last_extension(suffixes: Iterable[str]) -> dict[str, tuple[str, ...]]:
+    """
+    Groups lowercased suffixes, including the leading dot, by their last extension, e.g., '.tar.gz' by '.gz',
+    while keeping the order inside each group because the first matching suffix is stripped.
+    """
+    groups: dict[str, list[str]] = {}
+    for suffix in suffixes:
+        groups.setdefault(suffix[suffix.rfind('.') :], []).append(suffix)
+    return {extension: tuple(group) for extension, group in groups.items()}
 
 
-def strip_suffix_from_archive(path: str) -> str:
-    """Strips extensions like .tar.gz or .gz or .tgz, .rar, .zip ..."""
-    extensions = itertools.chain(
+_COMPRESSION_SUFFIXES = _group_by_last_extension(
+    '.' + extension.lower() for formatInfo in COMPRESSION_FORMATS.values() for extension in formatInfo.extensions
+)
+_ARCHIVE_SUFFIXES = _group_by_last_extension(
+    '.' + extension.lower()
+    for extension in itertools.chain(
         (e for extensions in TAR_CONTRACTED_EXTENSIONS.values() for e in extensions),
         ('t' + e for formatInfo in COMPRESSION_FORMATS.values() for e in formatInfo.extensions),
         ('tar.' + e for formatInfo in COMPRESSION_FORMATS.values() for e in formatInfo.extensions),
         (e for formatInfo in COMPRESSION_FORMATS.values() for e in formatInfo.extensions),
         (e for formatInfo in ARCHIVE_FORMATS.values() for e in formatInfo.extensions),
     )
-    for extension in extensions:
-        if path.lower().endswith('.' + extension.lower()):
-            return path[: -(len(extension) + 1)]
+)
+
+
+def _strip_first_matching_suffix(path: str, suffixesByLastExtension: dict[str, tuple[str, ...]]) -> str:
+    lowerPath = path.lower()
+    # Any matching suffix must end with the last extension of the path, which narrows it down to very few.
+    dotPosition = lowerPath.rfind('.')
+    if dotPosition < 0:
+        return path
+    for suffix in suffixesByLastExtension.get(lowerPath[dotPosition:], ()):
+        if lowerPath.endswith(suffix):
+            return path[: -len(suffix)]
     return path
 
 
-def has_matching_alphabets(a: str, b: str):
-    return (
-        (is_latin_alpha(a) and is_latin_alpha(b))
-        or (is_latin_digit(a) and is_latin_digit(b))
-        or (is_latin_hex_alpha(a) and is_latin_hex_alpha(b))
-    )
+def strip_suffix_from_compressed_file(path: str) -> str:
+    """Strips compression suffixes like .bz2, .gz, ..."""
+    return _strip_first_matching_suffix(path, _COMPRESSION_SUFFIXES)
+
+
+def strip_suffix_from_archive(path: str) -> str:
+    """Strips extensions like .tar.gz or .gz or .tgz, .rar, .zip ..."""
+    return _strip_first_matching_suffix(path, _ARCHIVE_SUFFIXES)
+
+
+# The same alphabets as checked by is_latin_alpha, is_latin_digit, and is_latin_hex_alpha.
+_LATIN_ALPHABETS = (frozenset(string.ascii_lowercase), frozenset(string.digits), frozenset(HEX))
+
+
+def has_matching_alphabets(a: str, b: str) -> bool:
+    if not a or not b:
+        return False
+    # Subset tests on the character sets run in C instead of testing each character in Python.
+    charactersA = frozenset(a)
+    charactersB = frozenset(b)
+    return any(charactersA <= alphabet and charactersB <= alphabet for alphabet in _LATIN_ALPHABETS)
 
 
 def check_for_sequence(extensions: Iterable[str], numberFormatter: Callable[[int], str]) -> list[str]:
@@ -222,6 +248,12 @@ def check_for_sequence(extensions: Iterable[str], numberFormatter: Callable[[int
     i = 0
     suffixLength = len(numberFormatter(0))
 
+    # Use a set for constant-time membership tests, which matters for split archives with many parts.
+    # If no extension has the length of the first two suffixes, then the sequence cannot even start.
+    extensions = set(extensions)
+    if all(len(extension) != suffixLength for extension in extensions):
+        return suffixSequence
+
     while True:
         suffix = numberFormatter(i)
         if suffix in extensions:
@@ -25,6 +25,8 @@ See:
 import contextlib
 import dataclasses
 import enum
+import io
+import os
 import re
 import struct
 import sys
@@ -442,14 +444,18 @@ for _formatInfo in FileFormatID:
 # calls by 65536.
 _MAGIC_BYTES_TO_FORMATS: dict[bytes, list[FileFormatID]] = {}
 _FORMATS_WITHOUT_MAGIC_BYTES: list[FileFormatID] = []
+_MAX_MAGIC_BYTES_LENGTH = 2
 
 
 def recompute_cached_magic_bytes():
     """Should be called when injecting new file formats from outside."""
+    global _MAX_MAGIC_BYTES_LENGTH
+
     for fid, info in FILE_FORMATS.items():
         if info.magicBytes is None or len(info.magicBytes) < 2:
             _FORMATS_WITHOUT_MAGIC_BYTES.append(fid)
         else:
+            _MAX_MAGIC_BYTES_LENGTH = max(_MAX_MAGIC_BYTES_LENGTH, len(info.magicBytes))
             firstTwoBytes = info.magicBytes[:2]
             if firstTwoBytes not in _MAGIC_BYTES_TO_FORMATS:
                 _MAGIC_BYTES_TO_FORMATS[firstTwoBytes] = []
@@ -475,19 +481,43 @@ def might_be_format(fileobj: IO[bytes], fid: Union[FileFormatID, FileFormatInfo]
     return bool(formatInfo.magicBytes or formatInfo.checkHeader)
 
 
-def detect_formats(fileobj: IO[bytes]) -> set[FileFormatID]:
+def _peek_header(fileobj: IO[bytes], size: int) -> bytes:
+    """Returns up to 'size' bytes starting at the current position without changing the position."""
+    # Plain files opened for reading can be read positionally, which skips the seek back and the buffering
+    # of the file object. Other file objects, e.g., gzip.GzipFile, may return the file descriptor of the
+    # underlying compressed file in 'fileno' and therefore must be read normally.
+    raw = fileobj.raw if isinstance(fileobj, io.BufferedReader) else fileobj
+    if hasattr(os, 'pread') and isinstance(raw, io.FileIO):
+        return os.pread(raw.fileno(), size, fileobj.tell())
+
     oldOffset = fileobj.tell()
     try:
-        firstTwoBytes = fileobj.read(2)
-        # I don't think there is any file format that can be recognized if the file is smaller than 2 B.
-        if len(firstTwoBytes) < 2:
-            return set()
-
-        formatsToTest = _MAGIC_BYTES_TO_FORMATS.get(firstTwoBytes, [])
+        return fileobj.read(size)
     finally:
         fileobj.seek(oldOffset)
 
-    return {fid for fid in formatsToTest + _FORMATS_WITHOUT_MAGIC_BYTES if might_be_format(fileobj, fid)}
+
+def detect_formats(fileobj: IO[bytes]) -> set[FileFormatID]:
+    # Read the header only once and compare all magic bytes against it instead of reading them for each format.
+    header = _peek_header(fileobj, _MAX_MAGIC_BYTES_LENGTH)
+    # I don't think there is any file format that can be recognized if the file is smaller than 2 B.
+    if len(header) < 2:
+        return set()
+
+    formatsToTest = _MAGIC_BYTES_TO_FORMATS.get(header[:2], [])
+
+    # Only the formats with an additional header check need to access the file again.
+    formats = set()
+    for fid in formatsToTest:
+        formatInfo = FILE_FORMATS[fid]
+        if (
+            formatInfo.magicBytes
+            and header.startswith(formatInfo.magicBytes)
+            and (not formatInfo.checkHeader or might_be_format(fileobj, formatInfo))
+        ):
+            formats.add(fid)
+    formats.update(fid for fid in _FORMATS_WITHOUT_MAGIC_BYTES if might_be_format(fileobj, fid))
+    return formats
 
 
 def replace_format_check(fid: FileFormatID, checkHeader: Optional[Callable[[IO[bytes]], bool]] = None):
@@ -1,14 +1,14 @@
 import contextlib
 import io
 import logging
+import mmap
 import os
-import re
 import stat
 import struct
-import tarfile
 import threading
+from collections.abc import Iterator
 from pathlib import Path
-from typing import IO, Optional, Union, cast
+from typing import IO, Callable, Optional, Union, cast
 
 from ratarmountcore.mountsource import FileInfo, MountSource
 from ratarmountcore.mountsource.SQLiteIndexMountSource import SQLiteIndexMountSource
@@ -18,24 +18,95 @@ from ratarmountcore.utils import RatarmountError, overrides
 
 logger = logging.getLogger(__name__)
 
-
-def _parse_ar_archive(fileObject: IO[bytes]) -> list[tarfile.TarInfo]:
-    """Parse the AR archive and return SQLiteIndex rows."""
-    # To make this reusable, it would make more sense to return a tarfile.TarInfo struct.
-    # TODO This would allow integration into SQLiteIndexedTar. But, instead of integrating it there,
-    #      it would be cleaner to extract the compression layer undoing out of SQLiteIndexedTar,
+# Offset | Length | Content                                  | Format
+# -------+--------+------------------------------------------+--------
+# 0      | 16     | File identifier                          | ASCII
+# 16     | 12     | File modification timestamp (in seconds) | Decimal
+# 28     |  6     | Owner ID                                 | Decimal
+# 34     |  6     | Group ID                                 | Decimal
+# 40     |  8     | File mode (type and permission)          | Octal
+# 48     | 10     | File size in bytes                       | Decimal
+# 58     |  2     | Ending characters                        | 0x60 0x0A
+# https://en.wikipedia.org/wiki/Ar_(Unix)
+_AR_HEADER_STRUCT = struct.Struct("16s12s6s6s8s10s2s")
+_AR_NAME_PADDING = b' \x00'
+
+
+@contextlib.contextmanager
+def _positional_reader(fileObject: IO[bytes]) -> Iterator[Callable[[int, int], bytes]]:
+    """
+    Yields a function returning at most 'size' bytes starting at 'offset'. For real files and in-memory files,
+    this avoids a Python-level seek and read per call by slicing a memory map or the underlying buffer.
+    Only plain files are memory-mapped because file objects of compressed streams, e.g., gzip.GzipFile,
+    may return the file descriptor of the underlying compressed file in 'fileno'.
+    """
+    raw = getattr(fileObject, 'raw', fileObject)
+    if isinstance(raw, io.FileIO):
+        mapped = None
+        with contextlib.suppress(OSError, ValueError):
+            mapped = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped is not None:
+            with mapped:
+                yield lambda offset, size: mapped[offset : offset + size]
+            return
+
+    if isinstance(fileObject, io.BytesIO):
+        with fileObject.getbuffer() as buffer:
+            yield lambda offset, size: bytes(buffer[offset : offset + size])
+        return
+
+    def read_at(offset: int, size: int) -> bytes:
+        fileObject.seek(offset)
+        return fileObject.read(size)
+
+    yield read_at
+
+
+@contextlib.contextmanager
+def _advise_sequential_access(fileno: int) -> Iterator[None]:
+    """
+    Hints the kernel to read ahead more aggressively while the headers are parsed in order. The member data
+    between the headers may get prefetched, too, but most archives with many members consist of small members.
+    Reset to the default afterward because FUSE reads may access members in any order.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        yield
+        return
+
+    with contextlib.suppress(OSError):
+        os.posix_fadvise(fileno, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    try:
+        yield
+    finally:
+        with contextlib.suppress(OSError):
+            os.posix_fadvise(fileno, 0, 0, os.POSIX_FADV_NORMAL)
+
+
+def _parse_ar_archive(fileObject: IO[bytes]) -> Iterator[tuple]:
+    """
+    Parse the AR archive and yield a tuple for each member in the order of the archive:
+        (name, linkname, header offset, data offset, size, mtime, mode, uid, gid)
+    Name and link name are not yet decoded. Plain tuples are used instead of tarfile.TarInfo because
+    the latter is comparatively expensive to construct and is only a temporary data carrier here.
+    """
+    # TODO Returning tarfile.TarInfo would allow integration into SQLiteIndexedTar. But, instead of integrating
+    #      it there, it would be cleaner to extract the compression layer undoing out of SQLiteIndexedTar,
     #      generalize it to work with arbitrarily stacked compressions.
     #      Then, SQLiteIndexedTar, ASARMountSource, ARMountSource, and other non-compressed archive formats,
     #      such as ISO, and possibly ZIP, might be refactored into a base class that implements the file lock
     #      and the stenciled file opening using the file offset and size in the underlying archive.
-    magic = fileObject.read(8)
+    with _positional_reader(fileObject) as read_at:
+        yield from _parse_ar_archive_from_reader(read_at)
+
+
+def _parse_ar_archive_from_reader(read_at: Callable[[int, int], bytes]) -> Iterator[tuple]:
+    magic = read_at(0, 8)
     is_thin = magic == b'!<thin>\n'
     if magic != b'!<arch>\n' and not is_thin:
         raise RatarmountError(f"Invalid AR magic bytes: {magic!r}")
 
-    offset = fileObject.tell()
-
-    _DECIMAL_NUMBER_REGEX = re.compile(b"[0-9]* *")
+    # AR has no folder support. Thin archives only contain links to the actual files.
+    file_type = stat.S_IFREG | (stat.S_IFLNK if is_thin else 0)
 
     def parse_int(field_bytes, base=10, default=0):
         # https://www.unix.com/man-page/opensolaris/3head/ar.h/
@@ -51,30 +122,27 @@ def _parse_ar_archive(fileObject: IO[bytes]) -> list[tarfile.TarInfo]:
         # > If the argument is not a number or if base is given, then it must be a string, bytes,
         # > or bytearray instance representing an integer in radix base.
         # > Optionally, the string can be [...] be surrounded by whitespace
-        if not _DECIMAL_NUMBER_REGEX.fullmatch(field_bytes):
+        #
+        # Check for the equivalent of the regex "[0-9]* *" with C-implemented bytes methods because this is
+        # called for 5 fields per header. Note that bytes.isdigit only returns True for ASCII digits.
+        field_str = field_bytes.rstrip(b' ')
+        if not field_str:
+            return default
+        if not field_str.isdigit():
             raise ValueError("Expected integer encoded as string padded with spaces, but got: %s", field_bytes)
-        field_str = field_bytes.strip()  # Strip to test whether it contains any valid digits.
-        return int(field_str, base) if field_str else default
-
-    files: list[tarfile.TarInfo] = []
-
-    # Offset | Length | Content                                  | Format
-    # -------+--------+------------------------------------------+--------
-    # 0      | 16     | File identifier                          | ASCII
-    # 16     | 12     | File modification timestamp (in seconds) | Decimal
-    # 28     |  6     | Owner ID                                 | Decimal
-    # 34     |  6     | Group ID                                 | Decimal
-    # 40     |  8     | File mode (type and permission)          | Octal
-    # 48     | 10     | File size in bytes                       | Decimal
-    # 58     |  2     | Ending characters                        | 0x60 0x0A
-    # https://en.wikipedia.org/wiki/Ar_(Unix)
-    HEADER_SIZE = 60
+        return int(field_str, base)
+
+    # Members that might refer to the GNU long name table before it has been encountered are held back
+    # so that they can be yielded with resolved names. All subsequent members are held back, too, to keep the order.
+    pending: list[tuple] = []
+
+    HEADER_SIZE = _AR_HEADER_STRUCT.size
     POSIX_SYMBOL_TABLE_NAME = b'/'
     GNU_INDEX_NAME = b'//'
     BSD_LONG_NAME_PREFIX = b'#1/'
-    # For thin archives, it simply is bytes because for some reason thin archives use byte indexes while
-    # normal archives index by file name entry.
-    long_names: Optional[Union[bytes, list[bytes]]] = None
+    # For thin archives, it maps byte offsets to names because for some reason thin archives use byte indexes
+    # while normal archives index by file name entry.
+    long_names: Optional[Union[dict[int, bytes], list[bytes]]] = None
 
     # It could be argued that the special 'debian-binary' text file could be ignored because it should be
     # interpreted as some kind of magic bytes, but I am not fully convinced of that. Simply also display
@@ -83,43 +151,34 @@ def _parse_ar_archive(fileObject: IO[bytes]) -> list[tarfile.TarInfo]:
     def get_long_file_name(name: bytes):
         if long_names and name.startswith(b'/') and name[1:].isdigit():
             index = int(name[1:])
+            if isinstance(long_names, dict):  # Should always be the case for is_thin.
+                return long_names.get(index, name)
             if index >= 0 and index < len(long_names):
-                if not is_thin:
-                    return long_names[index]
-
-                if isinstance(long_names, bytes):  # Should always be the case for is_thin.
-                    end = long_names.find(b'/\n', index)
-                    if end >= index:
-                        return long_names[index:end]
+                return long_names[index]
         return name
 
-    while header_data := fileObject.read(HEADER_SIZE):
+    position = len(magic)
+    while header_data := read_at(position, HEADER_SIZE):
         if len(header_data) < HEADER_SIZE:
             raise RatarmountError(f"Encountered incomplete AR header: {header_data!r}")
 
-        offset = fileObject.tell()
-        tar_info = tarfile.TarInfo()
-        tar_info.offset = offset - HEADER_SIZE
-        tar_info.offset_data = offset
+        offset = position + HEADER_SIZE
 
         try:
-            header_parts = struct.unpack("16s12s6s6s8s10s2s", header_data)
+            header_parts = _AR_HEADER_STRUCT.unpack(header_data)
             if header_parts[-1] != b'`\n':
                 raise RatarmountError(f"Invalid AR file header ending characters ({header_parts[-1]})!")
 
-            name = header_parts[0].rstrip(b' \x00')
+            name = header_parts[0].rstrip(_AR_NAME_PADDING)
 
             # fmt: off
-            tar_info.mtime = parse_int(header_parts[1], 10)
-            tar_info.uid   = parse_int(header_parts[2], 10)
-            tar_info.gid   = parse_int(header_parts[3], 10)
-            tar_info.mode  = parse_int(header_parts[4], 8, 0o660) | stat.S_IFREG  # AR has no folder support
-            tar_info.size  = parse_int(header_parts[5], 10)
+            mtime = parse_int(header_parts[1], 10)
+            uid   = parse_int(header_parts[2], 10)
+            gid   = parse_int(header_parts[3], 10)
+            mode  = parse_int(header_parts[4], 8, 0o660) | file_type
+            size  = parse_int(header_parts[5], 10)  # Includes the BSD long name for correct even-byte padding.
             # fmt: on
 
-            if is_thin:
-                tar_info.mode |= stat.S_IFLNK
-
         except (ValueError, struct.error) as exception:
             logger.warning(
                 "Failed to parse AR header at offset %s because of: %s",
@@ -130,32 +189,39 @@ def _parse_ar_archive(fileObject: IO[bytes]) -> list[tarfile.TarInfo]:
             logger.debug("Header data: %s", header_data)
             raise RatarmountError("Invalid AR archive!") from exception
 
-        size = tar_info.size  # Includes the BSD long name for correct even-byte padding.
-
         if name == POSIX_SYMBOL_TABLE_NAME:
             # Ignore the symbol table for now.
-            fileObject.seek(size + size % 2, io.SEEK_CUR)
+            position = offset + ((size + 1) & ~1)
             continue
 
         if name == GNU_INDEX_NAME:
+            position = offset + size
             if is_thin:
-                long_names = fileObject.read(size)
+                # Split the table only once instead of searching the end of the name for each member.
+                long_names = {}
+                data = read_at(offset, size)
+                start = 0
+                while (end := data.find(b'/\n', start)) >= 0:
+                    long_names[start] = data[start:end]
+                    start = end + 2
             else:
-                long_names = fileObject.read(size).split(b'/\n')
+                # Strip once per table instead of once per member. See the comment for BSD long names.
+                long_names = [long_name.strip(b'\0') for long_name in read_at(offset, size).split(b'/\n')]
 
                 # GNU ar pads the table internally to an even size.
-                if size % 2 == 0:
+                if not size & 1:
                     if long_names and long_names[-1] in (b'\x60', b'\x0a'):
                         long_names.pop()
                 else:
-                    fileObject.seek(size % 2, io.SEEK_CUR)  # Skip padding
+                    position += 1  # Skip padding
 
             # Retroactively apply the index if it is not the very first entry in the archive.
-            for file in files:
+            for pending_name, pending_linkname, *pending_rest in pending:
                 if is_thin:
-                    file.linkname = get_long_file_name(file.name)  # type: ignore
+                    yield (pending_name, get_long_file_name(pending_name), *pending_rest)
                 else:
-                    file.name = get_long_file_name(file.name)  # type: ignore
+                    yield (get_long_file_name(pending_name), pending_linkname, *pending_rest)
+            pending = []
 
             continue
 
@@ -166,34 +232,38 @@ def _parse_ar_archive(fileObject: IO[bytes]) -> list[tarfile.TarInfo]:
             # > The file size (stored in the archive header) is incremented by the length of the name.
             # > The name is then written immediately following the archive header.
             name_size = int(name[len(BSD_LONG_NAME_PREFIX) :])
-            name = fileObject.read(name_size)
+            name = read_at(offset, name_size)
             if len(name) != name_size:
                 raise RatarmountError(f"Read insufficient data for BSD long file name ({name_size}): {name!r}")
-            tar_info.offset_data += name_size
-            tar_info.size -= name_size
+            # Archives created with llvm-ar-19 -r --format=bsd add random null-byte padding even though padding
+            # should not be necessary because the name size can be specified exactly via BSD_LONG_NAME_PREFIX.
+            name = name.strip(b'\0')
+        else:
+            name_size = 0
 
+        linkname = b''
         if long_names:
             if is_thin:
-                tar_info.linkname = get_long_file_name(name)
-                tar_info.type = tarfile.SYMTYPE
+                linkname = get_long_file_name(name)
             else:
                 name = get_long_file_name(name)
 
-        # Archives created with llvm-ar-19 -r --format=bsd add random null-byte padding even though
-        # padding should not be necessary because the name size can be specified exactly via BSD_LONG_NAME_PREFIX.
-        tar_info.name = name.strip(b'\0')
-        files.append(tar_info)
+        member = (name, linkname, position, offset + name_size, size - name_size, mtime, mode, uid, gid)
+        if pending or (not long_names and name.startswith(b'/')):
+            pending.append(member)
+        else:
+            yield member
 
         if is_thin:
-            fileObject.seek(offset)
+            position = offset
             continue
 
         # Skip padding: https://www.unix.com/man-page/opensolaris/3head/ar.h/
         # > Each archive file member begins on an even byte boundary; a newline is inserted between files if necessary.
         # > Nevertheless, the size given reflects the actual size of the file exclusive of padding.
-        fileObject.seek(offset + size + (size % 2))
+        position = offset + ((size + 1) & ~1)
 
-    return files
+    yield from pending
 
 
 # TODO Very similar to ASARMountSource. There might be more potential for refactoring to minimize code duplication.
@@ -211,46 +281,56 @@ class ARMountSource(SQLiteIndexMountSource):
         super().__init__(**(options | indexOptions))
 
         # Try to get block size from the real opened file.
-        self.blockSize = 512
-        with contextlib.suppress(Exception):
+        try:
             self.blockSize = os.fstat(self.fileObject.fileno()).st_blksize
+        except (OSError, AttributeError, ValueError):  # io.UnsupportedOperation derives from OSError and ValueError.
+            self.blockSize = 512
 
         self.fileObjectLock = threading.Lock()
 
-        self._finalize_index(
-            lambda: self.index.set_file_infos(
-                [self._convert_to_row(info) for info in _parse_ar_archive(self.fileObject)]
-            )
-        )
+        self._finalize_index(self._create_index)
+
+    def _create_index(self) -> None:
+        # Only give access hints for files opened by us in order to not affect file objects of the caller.
+        with contextlib.nullcontext() if self.isFileObject else _advise_sequential_access(self.fileObject.fileno()):
+            encoding = self.index.encoding
+            fileInfos = []
+            for member in _parse_ar_archive(self.fileObject):
+                fileInfos.append(self._convert_to_row(member, encoding))
+                if len(fileInfos) > 1000:
+                    self.index.set_file_infos(fileInfos)
+                    fileInfos = []
 
-    def _convert_to_row(self, info: tarfile.TarInfo) -> tuple:
-        mode = info.mode
-        if mode == 0:
-            mode = 0o770 if info.isdir() else 0o660
-        mode = mode | (stat.S_IFLNK if info.issym() else mode) | (stat.S_IFDIR if info.isdir() else stat.S_IFREG)
+            if fileInfos:
+                self.index.set_file_infos(fileInfos)
 
-        name = info.name.decode(self.index.encoding)  # type: ignore
-        path, name = SQLiteIndex.normpath(self.transform(name)).rsplit("/", 1)
+    def _convert_to_row(self, member: tuple, encoding: str) -> tuple:
+        name, linkname, offset, offset_data, size, mtime, mode, uid, gid = member
+        # Normalized paths always start with a slash. Splitting via rfind avoids the temporary list of rsplit.
+        path = SQLiteIndex.normpath(self.transform(name.decode(encoding)))
+        separator = path.rfind('/')
+        path, name = path[:separator], path[separator + 1 :]
 
-        linkname = info.linkname.decode(self.index.encoding) if isinstance(info.linkname, bytes) else info.linkname
+        # Only members of thin archives have link names.
+        linkname = linkname.decode(encoding) if linkname else ""
 
         # fmt: off
         fileInfo : tuple = (
-            path            ,  # 0  : path
-            name            ,  # 1  : file name
-            info.offset     ,  # 2  : header offset
-            info.offset_data,  # 3  : data offset
-            info.size       ,  # 4  : file size
-            info.mtime      ,  # 5  : modification time
-            mode            ,  # 6  : file mode / permissions
-            0               ,  # 7  : TAR file type. Currently unused.
-            linkname        ,  # 8  : linkname
-            info.uid        ,  # 9  : user ID
-            info.gid        ,  # 10 : group ID
-            False           ,  # 11 : is TAR (unused?)
-            False           ,  # 12 : is sparse
-            False           ,  # 13 : is generated (parent folder)
-            0               ,  # 14 : recursion depth
+            path       ,  # 0  : path
+            name       ,  # 1  : file name
+            offset     ,  # 2  : header offset
+            offset_data,  # 3  : data offset
+            size       ,  # 4  : file size
+            mtime      ,  # 5  : modification time
+            mode       ,  # 6  : file mode / permissions
+            0          ,  # 7  : TAR file type. Currently unused.
+            linkname   ,  # 8  : linkname
+            uid        ,  # 9  : user ID
+            gid        ,  # 10 : group ID
+            False      ,  # 11 : is TAR (unused?)
+            False      ,  # 12 : is sparse
+            False      ,  # 13 : is generated (parent folder)
+            0          ,  # 14 : recursion depth
         )
         # fmt: on
 
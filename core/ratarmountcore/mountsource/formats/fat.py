@@ -1,4 +1,5 @@
 import errno
+import functools
 import io
 import posixpath
 import stat
@@ -18,6 +19,13 @@ except ImportError:
     PyFat = None  # type: ignore
     PyFATException = None  # type: ignore
 
+# FAT has no owners. Query them only once instead of for each lookup.
+_UID = get_userid()
+_GID = get_groupid()
+# FAT has no file permissions.
+_DIRECTORY_MODE = 0o777 | stat.S_IFDIR
+_FILE_MODE = 0o777 | stat.S_IFREG
+
 
 def is_fat_image(fileObject) -> bool:
     if PyFat is None:
@@ -59,22 +67,27 @@ class FATMountSource(MountSource):
             self.fileSystem.set_fp(fileOrPath)
         self.options = options
 
+        # Each lookup walks the directory entries of all parent folders. Because the file system is opened
+        # read-only, lookups can be cached without ever needing to be invalidated.
+        self._get_entry = functools.lru_cache(maxsize=4096)(self._get_entry_uncached)
+
+    @staticmethod
+    def _get_mode(entry) -> int:
+        return _DIRECTORY_MODE if entry.is_directory() else _FILE_MODE
+
     @staticmethod
     def _convert_fatdirectory_entry_to_file_info(entry, path) -> FileInfo:
         """
         entry: of type pyfatfs.FATDirectoryEntry.FATDirectoryEntry.
         """
-        # FAT has no file permissions.
-        mode = 0o777 | (stat.S_IFDIR if entry.is_directory() else stat.S_IFREG)
-
         # fmt: off
         return FileInfo(
             size     = entry.filesize,
             mtime    = entry.get_mtime().timestamp(),
-            mode     = mode,
+            mode     = FATMountSource._get_mode(entry),
             linkname = "",  # FAT has no support for hard or symbolic links
-            uid      = get_userid(),
-            gid      = get_groupid(),
+            uid      = _UID,
+            gid      = _GID,
             userdata = [path],
         )
         # fmt: on
@@ -83,38 +96,47 @@ class FATMountSource(MountSource):
     def is_immutable(self) -> bool:
         return True
 
-    @overrides(MountSource)
-    def exists(self, path: str) -> bool:
+    def _get_entry_uncached(self, path: str):
         try:
-            self.fileSystem.root_dir.get_entry(path)
+            return self.fileSystem.root_dir.get_entry(path)
         except PyFATException as exception:
-            if exception.errno == errno.ENOENT:
-                return False
+            if exception.errno in [errno.ENOENT, errno.ENOTDIR]:
+                return None
             raise exception
-        return True
 
-    def _list(self, path: str) -> Optional[Iterable]:
+    @overrides(MountSource)
+    def exists(self, path: str) -> bool:
+        return self._get_entry(path) is not None
+
+    def _list(self, path: str) -> Optional[list]:
+        entry = self._get_entry(posixpath.normpath(path))
+        if entry is None:
+            return None
         try:
-            directories, files, _ = self.fileSystem.root_dir.get_entry(posixpath.normpath(path)).get_entries()
+            directories, files, _ = entry.get_entries()
         except PyFATException as exception:
             if exception.errno in [errno.ENOENT, errno.ENOTDIR]:
                 return None
             raise exception
-        return [str(entry) for entry in directories + files]
+        return directories + files
 
     @overrides(MountSource)
     def list(self, path: str) -> Optional[Union[Iterable[str], dict[str, FileInfo]]]:
         # TODO I think with the low-level API, we could also get the FileInfos
-        return self._list(path)
+        entries = self._list(path)
+        return None if entries is None else [str(entry) for entry in entries]
+
+    @overrides(MountSource)
+    def list_mode(self, path: str) -> Optional[Union[Iterable[str], dict[str, int]]]:
+        # The directory entries already contain the type, so there is no need for a lookup of each listed path.
+        entries = self._list(path)
+        return None if entries is None else {str(entry): self._get_mode(entry) for entry in entries}
 
     @overrides(MountSource)
     def lookup(self, path: str, fileVersion: int = 0) -> Optional[FileInfo]:
-        try:
-            entry = self.fileSystem.root_dir.get_entry(path)
-        except PyFATException as exception:
-            if exception.errno in [errno.ENOTDIR, errno.ENOENT]:
-                return None
-            raise exception
+        entry = self._get_entry(path)
+        if entry is None:
+            return None
         return self._convert_fatdirectory_entry_to_file_info(entry, path)
 
     @overrides(MountSource)
@@ -1,10 +1,13 @@
-import base64
+import binascii
+import contextlib
 import encodings
+import functools
 import hashlib
 import html
 import io
 import logging
 import mimetypes
+import mmap
 import os
 import re
 import stat
@@ -12,8 +15,8 @@ import tarfile
 import threading
 import time
 import urllib.parse
+from collections.abc import Iterator
 from dataclasses import dataclass
-from html.parser import HTMLParser
 from typing import IO, Optional, Union
 
 from ratarmountcore.formats import is_html_file
@@ -43,7 +46,6 @@ logger = logging.getLogger(__name__)
 #     video     poster
 #     video     src
 # -> This means that for the 'video' tag, there likely will be multiple attributes!
-#    This complicates the algorithm a bit because we only get the offset of the tag, not for each attribute.
 # -> In general, simply check all tag values for the prefix: data:image/x-icon;base64,
 # 'grep' -r -h -o '"data:[^;]*;base64,' <files> | sort -u
 # These are some unexpected outliers:
@@ -94,21 +96,6 @@ logger = logging.getLogger(__name__)
 # https://stackoverflow.com/questions/273354/are-single-quotes-allowed-in-html
 
 
-@dataclass
-class LineOffset:
-    line: int = 0
-    offset: int = 0
-
-
-@dataclass
-class EmbeddedFileCandidate:
-    # line number (starting at 1) and character offset
-    original_url: str
-    attribute: str
-    start: LineOffset
-    next: Optional[LineOffset] = None
-
-
 # https://datatracker.ietf.org/doc/html/rfc2397
 #   data:[<mediatype>][;base64],<data>
 #   Syntax
@@ -116,123 +103,21 @@ class EmbeddedFileCandidate:
 #       mediatype  := [ type "/" subtype ] *( ";" parameter )
 #       data       := *urlchar
 #       parameter  := attribute "=" value
-DATA_URL_MIME_TYPE = """(?P<mime_type>[^;,"']+/[^;,"']+)"""
-DATA_URL_PARAMETERS = """(?P<parameters>(;[^;,"']*)*)"""
+DATA_URL_MIME_TYPE = """(?P<mime_type>[^;,"'/]+/[^;,"']+)"""
+DATA_URL_PARAMETERS = """(?P<parameters>(?:;[^;,"']*)*)"""
 DATA_URL_PREFIX = f"(?P<data_url>data:{DATA_URL_MIME_TYPE}?{DATA_URL_PARAMETERS},"
 DATA_URL_REGEX = re.compile(DATA_URL_PREFIX + ")")
-DATA_URL_IN_CSS = re.compile(
-    "(/[*]savepage-url=(?P<original_url>[^*]+)[*]/)?url[(]" + DATA_URL_PREFIX + "(?P<data>[^)]+))[)]"
+# Added by the "Save Page WE" extension in front of url(...) in CSS style sheets.
+SAVEPAGE_URL_COMMENT = b"/*savepage-url="
+# Same as DATA_URL_PREFIX but without groups, so that it can be used in multiple branches of one regex.
+DATA_URL_PREFIX_UNNAMED = """data:(?:[^;,"'/]+/[^;,"']+)?(?:;[^;,"']*)*,"""
+# Data URLs in text, e.g., in CSS style sheets or in quoted strings inside scripts. Only one of the named groups
+# 'css', 'single_quote', or 'double_quote' will match and contain the data URL without the delimiters.
+DATA_URL_IN_TEXT = (
+    "url[(](?P<css>" + DATA_URL_PREFIX_UNNAMED + "[^)]+)[)]"
+    "|'(?P<single_quote>" + DATA_URL_PREFIX_UNNAMED + "[^']+)'"
+    '|"(?P<double_quote>' + DATA_URL_PREFIX_UNNAMED + '[^"]+)"'
 )
-DATA_URL_SINGLE_QUOTE = re.compile("'" + DATA_URL_PREFIX + "(?P<data>[^']+))'")
-DATA_URL_DOUBLE_QUOTE = re.compile('"' + DATA_URL_PREFIX + '(?P<data>[^"]+))"')
-
-
-class HTMLDataURLParser(HTMLParser):
-    """Parser to extract data URLs from HTML elements."""
-
-    def __init__(self) -> None:
-        # handle_data() might be called more than once if convert_charrefs is false.
-        # However, it might be necessary to gather all char refs to correctly compute offsets to data URLs.
-        # TODO It's a nightmare. For now, let's ignore char/ent refs.
-        # https://en.wikipedia.org/wiki/Standard_Generalized_Markup_Language#Document_validity
-        # https://en.wikipedia.org/wiki/XML#Escaping
-        super().__init__(convert_charrefs=True)
-        self.files: list[EmbeddedFileCandidate] = []
-        self._char_refs: list[LineOffset] = []
-        self._entity_refs: list[LineOffset] = []
-
-    @overrides(HTMLParser)
-    def handle_starttag(self, tag: str, attrs: list[tuple[str, str]]) -> None:
-        """
-        For instance, for the tag <A HREF="https://www.cwi.nl/">, this method would be called as
-        handle_starttag('a', [('href', 'https://www.cwi.nl/')]).
-        """
-        self._update_end_offset()
-
-        # getpos gives the start offset of the current tag.
-        if not any(v.startswith('data:') for _, v in attrs):
-            return
-
-        attributes = dict(attrs)
-        for attribute, value in attributes.items():
-            if not value.startswith('data:'):
-                continue
-
-            # We are only interested in non-zero length payloads, and the comma is required by RFC 2397.
-            comma = value.find(',')
-            if comma < 0 or comma + 1 >= len(value):
-                continue
-
-            self.files.append(
-                EmbeddedFileCandidate(
-                    original_url=attributes.get("data-savepage-" + attribute, ""),
-                    attribute=attribute,
-                    start=LineOffset(*self.getpos()),
-                )
-            )
-
-    # Overwrite all other handles so that we can extract a guess for the end position corresponding to the
-    # getpos result in handle_starttag.
-
-    @overrides(HTMLParser)
-    def handle_endtag(self, tag: str) -> None:
-        """
-        Note that there are start tags without end tags, e.g., <br>. They will trigger this method.
-        But tags with such as <iframe .../> will trigger the handle_starttag and handle_endtag methods.
-        """
-        self._update_end_offset()
-
-    @overrides(HTMLParser)
-    def handle_data(self, data: str) -> None:
-        self._update_end_offset()
-
-        # Search in data because sometimes it may contain further data URIs, e.g., in CSS style sheets such as:
-        # /*savepage-url=/assets/fonts/robotocondensed-regular-webfont.ttf*/url(data:application/x-font-ttf;base64,...
-        line, offset = self.getpos()
-
-        self.files.extend(
-            EmbeddedFileCandidate(
-                original_url=match.groupdict().get('original_url', ''),
-                attribute='',
-                start=LineOffset(line, offset + match.span('data_url')[0]),
-                next=LineOffset(line, offset + match.span('data_url')[1]),
-            )
-            for matches in (
-                DATA_URL_IN_CSS.finditer(data),
-                DATA_URL_SINGLE_QUOTE.finditer(data),
-                DATA_URL_DOUBLE_QUOTE.finditer(data),
-            )
-            for match in matches
-        )
-
-    @overrides(HTMLParser)
-    def handle_decl(self, data: str) -> None:
-        self._update_end_offset()
-
-    @overrides(HTMLParser)
-    def handle_entityref(self, name: str) -> None:
-        self._entity_refs.append(LineOffset(*self.getpos()))
-
-    @overrides(HTMLParser)
-    def handle_charref(self, name: str) -> None:
-        self._char_refs.append(LineOffset(*self.getpos()))
-
-    def _update_end_offset(self) -> None:
-        if not self.files:
-            return
-
-        # getpos can sometimes be equal to the 'start', e.g., for <iframe/> because it seems that handle_starttag
-        # and handle_endtag get triggered from the same position.
-        file = self.files[-1]
-        if file.next is not None or LineOffset(*self.getpos()) == file.start:
-            return
-
-        self.files[-1] = EmbeddedFileCandidate(
-            original_url=file.original_url,
-            attribute=file.attribute,
-            start=file.start,
-            next=LineOffset(*self.getpos()),
-        )
 
 
 class DataURLFile(io.BytesIO):
@@ -244,7 +129,7 @@ class DataURLFile(io.BytesIO):
     # TODO Implement it in a streaming manner... Might be impossible or require too much memory overhead because
     #      of all the necessary conversions:
     #          bytes -> UTF-8 -> char/entity references -> URL unquoting -> base64 decoding
-    def __init__(self, data_url: Optional[str] = None):
+    def __init__(self, data_url: Optional[Union[str, bytes]] = None, html_encoding: str = tarfile.ENCODING):
         # https://datatracker.ietf.org/doc/html/rfc2397
         # > If <mediatype> is omitted, it defaults to text/plain;charset=US-ASCII.
         # > As a shorthand, "text/plain" can be omitted but the charset parameter supplied.
@@ -253,8 +138,24 @@ class DataURLFile(io.BytesIO):
         self.encoding = 'ascii'  # https://docs.python.org/3/library/codecs.html#standard-encodings
         self.is_base64 = False
 
-        data = urllib.parse.unquote(html.unescape(data_url or ""))
-        match = DATA_URL_REGEX.match(data)
+        # Fast path for the common case of data URLs without character references and URL-encoding. Both
+        # require '&' or '%', without which unescaping and unquoting would be no-ops. This avoids decoding and
+        # copying the possibly large payload, e.g., of base64-encoded images, multiple times.
+        data: Union[str, bytes]
+        if isinstance(data_url, bytes) and b'&' not in data_url and b'%' not in data_url:
+            data = data_url
+            comma = data_url.find(b',')
+            prefix = data_url[: comma + 1].decode(html_encoding, errors='replace')
+        else:
+            if isinstance(data_url, bytes):
+                data_url = data_url.decode(html_encoding, errors='replace')
+            data = urllib.parse.unquote(html.unescape(data_url or ""))
+            comma = data.find(',')
+            prefix = data[: comma + 1]
+
+        # The media type and parameters cannot contain commas. Therefore, it suffices to match the prefix up to the
+        # first comma instead of letting the regex engine process the possibly large payload.
+        match = DATA_URL_REGEX.match(prefix)
         if not match:
             super().__init__()
             return
@@ -284,8 +185,18 @@ class DataURLFile(io.BytesIO):
                 if standard_encoding := encodings.search_function(value.strip()):
                     self.encoding = standard_encoding.name
 
-        data = data[match.end() :]
-        decoded = base64.b64decode(data) if self.is_base64 else data.encode(self.encoding)
+        # Slice a view of bytes in order to not copy the possibly large payload once more. The match always ends
+        # with the first comma. Use its position because the match offsets refer to the decoded prefix, which,
+        # for bytes, might differ from the byte offsets, e.g., for non-ASCII parameters.
+        payload: Union[str, memoryview]
+        payload = memoryview(data)[comma + 1 :] if isinstance(data, bytes) else data[comma + 1 :]
+        if self.is_base64:
+            # Same as base64.b64decode without validation, but without converting and copying str arguments.
+            decoded = binascii.a2b_base64(payload)
+        else:
+            if isinstance(payload, memoryview):
+                payload = str(payload, html_encoding, errors='replace')
+            decoded = payload.encode(self.encoding)
         super().__init__(decoded)
 
 
@@ -312,130 +223,282 @@ HTML_NAME_PATTERN = "[A-Za-z][A-Za-z0-9.-]*"
 #
 #          NOTE - Some historical implementations allow any
 #          character except space or `>' in a name token.
-HTML_ATTRIBUTE_VALUE_PATTERN = """(?P<value>'[^']*'|"[^"]*"|[A-Za-z0-9.-]*)"""
-HTML_ATTRIBUTE_PATTERN = "(?P<attribute>" + HTML_NAME_PATTERN + r")(\s*=\s*" + HTML_ATTRIBUTE_VALUE_PATTERN + ")?"
-HTML_ATTRIBUTE_REGEX = re.compile(fr"\s+{HTML_ATTRIBUTE_PATTERN}")
-HTML_START_TAG_REGEX = re.compile(f"<{HTML_NAME_PATTERN}")
+HTML_ATTRIBUTE_VALUE_PATTERN = r"""(?P<value>'[^']*'|"[^"]*"|[^\s"'=<>`]*)"""
+# Attribute names are much more lenient in practice than the name tokens above, e.g., xlink:href in SVGs.
+HTML_ATTRIBUTE_NAME_PATTERN = r"""[^\s"'<>/=]+"""
+HTML_ATTRIBUTE_PATTERN = (
+    "(?P<attribute>" + HTML_ATTRIBUTE_NAME_PATTERN + r")(?:\s*=\s*" + HTML_ATTRIBUTE_VALUE_PATTERN + ")?"
+)
+HTML_ATTRIBUTE_REGEX = re.compile(rf"[\s/]*{HTML_ATTRIBUTE_PATTERN}".encode())
+
+# Contents of these elements are raw text like for HTMLParser.CDATA_CONTENT_ELEMENTS, i.e., '<!--' does not start
+# a comment inside them and tags are not parsed. Only data URLs in text are searched in them.
+RAW_TEXT_ELEMENT_PATTERN = r"(?i:script|style)(?=[\s/>])"
+RAW_TEXT_END_REGEXES = {name: re.compile(rb"</\s*" + name + rb"\s*>", re.IGNORECASE) for name in (b'script', b'style')}
+DATA_URL_IN_TEXT_REGEX = re.compile(DATA_URL_IN_TEXT.encode())
+# Starts of comments and raw text elements, after which the HTML has to be interpreted differently.
+LEXICAL_STATE_REGEX = re.compile(rf"<(?:!--|{RAW_TEXT_ELEMENT_PATTERN})".encode())
+
+# Finds all candidates for data URLs in a single pass over the whole HTML:
+#  - Comments and raw text elements are matched only by their start in order to skip over them. Unterminated
+#    comments are not treated as comments in order to not lose all following data URLs.
+#  - Start tags are only of interest if an attribute value might be a data URL. Note that the colon might be
+#    replaced by a character reference, e.g., data&#58;text/plain. Quoted attribute values may contain '<' and
+#    '>'. Each character outside of quotes is consumed singly, so that there is only one way to match and no
+#    super-linear backtracking. The attributes are parsed further with HTML_ATTRIBUTE_REGEX.
+#  - Data URLs in text, e.g., in CSS style sheets such as:
+#    /*savepage-url=/assets/fonts/robotocondensed-regular-webfont.ttf*/url(data:application/x-font-ttf;base64,...
+#    or in quoted strings inside scripts.
+DATA_URL_CANDIDATE_REGEX = re.compile(
+    rb"(?P<comment><!--)"
+    + rf"|(?P<raw_text><{RAW_TEXT_ELEMENT_PATTERN})".encode()
+    + rf"""|(?P<tag><{HTML_NAME_PATTERN})(?=(?:[^<>"']|"[^"]*"|'[^']*')*?["']?data[:&])""".encode()
+    + f"|{DATA_URL_IN_TEXT}".encode()
+)
 
 
-def _find_tag_attribute_spans(data: str, attribute: str) -> tuple[int, int]:
+def _find_data_url_attributes(
+    data: Union[bytes, mmap.mmap], position: int, encoding: str
+) -> tuple[list[tuple[str, int, int]], int]:
     """
-    Given 'data', which is assumed to start with an HTML start tag, i.e., '<', not followed by '/',
-    find offsets and lengths of the values for the given 'attributes' in this tag.
+    Given 'data' and the 'position' right after the name of an HTML start tag, return the original URLs and
+    the spans of all attribute values, which look like data URLs, and the position after the last attribute.
     """
-    # Skip over the name assumed to be at the start.
     # https://www.ietf.org/rfc/rfc1866.txt
-    # > A name consists of a letter followed by letters, digits, periods, or
-    # > hyphens. The length of a name is limited to 72 characters
-    startTag = HTML_START_TAG_REGEX.match(data)
-    if not startTag:
-        return 0, 0
-
-    position = startTag.end()
+    values: dict[bytes, tuple[int, int]] = {}
     while match := HTML_ATTRIBUTE_REGEX.match(data, position):
         position = match.end()
-        if match.group('attribute') == attribute:
-            result = match.span('value')
-            return (result[0] + 1, result[1] - 1) if data[result[0]] in ["'", '"'] else result
+        start, end = match.span('value')
+        if start >= 0:
+            if data[start : start + 1] in (b"'", b'"'):
+                start, end = start + 1, end - 1
+            values.setdefault(match.group('attribute').lower(), (start, end))
+
+    results: list[tuple[str, int, int]] = []
+    for attribute, (start, end) in values.items():
+        if data[start : min(start + 4, end)] != b'data':
+            continue
+
+        # Attribute values may contain character references anywhere, even in the 'data:' prefix.
+        # Only copy the value in this case in order to not copy possibly large payloads just for checking them.
+        if data.find(b'&', start, end) >= 0:
+            value = html.unescape(data[start:end].decode(encoding, errors='replace')).encode(encoding, errors='replace')
+            prefix, comma, size = value[:5], value.find(b','), len(value)
+        else:
+            prefix, comma, size = data[start : min(start + 5, end)], data.find(b',', start, end), end - start
+            if comma >= 0:
+                comma -= start
 
-    return 0, 0
+        # We are only interested in non-zero length payloads, and the comma is required by RFC 2397.
+        if prefix != b'data:' or comma < 0 or comma + 1 >= size:
+            continue
 
+        original_url = ""
+        if original_span := values.get(b"data-savepage-" + attribute):
+            original_url = html.unescape(data[original_span[0] : original_span[1]].decode(encoding, errors='replace'))
+        results.append((original_url, start, end))
 
-@dataclass
-class EmbeddedFile:
-    # line number (starting at 1) and character offset
-    original_url: str
-    span: tuple[int, int]
+    return results, position
 
 
-def gather_embedded_files(fileobj: IO[str]) -> list[EmbeddedFile]:
-    # In order to convert (line number, row) into a file offset we need to know the character offsets
-    # for each line, or even better, the byte offsets for each line! In the worst case, the whole HTML
-    # will be on a single line!
-    lineOffsets: list[int] = [0]  # list index -> character offset
-
-    parser = HTMLDataURLParser()
-    processed_data_size = 0
-    while data := fileobj.read(128 * 1024):
-        position = 0
-        while (position := data.find('\n', position)) >= 0:
-            position += 1  # Skip over newline to point to the line start not line end and to progress the loop.
-            lineOffsets.append(processed_data_size + position)
-        processed_data_size += len(data)
-
-        parser.feed(data)
-    file_size = processed_data_size
-
-    def to_char_offset(line_offset: LineOffset):
-        return lineOffsets[line_offset.line - 1] + line_offset.offset
-
-    # The TextIOWrapper, used in 'open' with text mode, is kinda insane. The arguments to 'read' are in characters.
-    # However, the values to 'seek' and from 'tell' seem to be in bytes! html.parser.getpos seems to really return
-    # character offsets. I.e., in order to seek to positions and keep multi-byte UTF-8 support, we need to convert
-    # all character positions to byte positions.
-    # Avoid any seeks at all by sorting all offsets to convert and creating a dictionary.
-    char_to_byte_offset = {}
-    fileobj.seek(0)
-    processed_data_size = 0
-    for offset in sorted(
-        [
-            o
-            for file in parser.files
-            for o in [to_char_offset(file.start), to_char_offset(file.next) if file.next else file_size]
-        ]
-    ):
-        assert offset >= processed_data_size
-        if offset > processed_data_size:
-            data = fileobj.read(offset - processed_data_size)
-            processed_data_size += len(data)
-
-        assert offset == processed_data_size
-        if offset == processed_data_size:
-            char_to_byte_offset[offset] = fileobj.tell()
-
-    files: list[EmbeddedFile] = []
-    for file in parser.files:
-        start = char_to_byte_offset[to_char_offset(file.start)]
-        end = char_to_byte_offset[to_char_offset(file.next) if file.next else file_size]
-        if not file.attribute:
-            files.append(EmbeddedFile(original_url=file.original_url, span=(start, end)))
+def _find_data_literal(data: Union[bytes, mmap.mmap], position: int) -> int:
+    """
+    Returns the position of the next literal 'data' at or after 'position' that might start a data URL, or -1.
+    All data URLs contain this literal because character references are only supported after it. Searching for
+    this literal is much faster than searching with the regex, which has to try all alternatives at each position,
+    and makes it possible to skip most of the HTML.
+    """
+    hit = position
+    while (hit := data.find(b'data', hit)) >= 0:
+        # Quickly skip custom data-* attributes and other words containing the literal.
+        if data[hit + 4 : hit + 5] in (b':', b'&'):
+            return hit
+        hit += 4
+    return -1
+
+
+def _find_scan_start(data: Union[bytes, mmap.mmap], position: int, hit: int) -> int:
+    """
+    Returns a position in [position, hit], from which DATA_URL_CANDIDATE_REGEX can be searched without missing
+    a data URL containing the literal at 'hit'.
+    A start tag containing a data URL starts at the last '<' followed by a letter before the literal. This may
+    only be wrong if an attribute value of that tag contains such a '<', e.g., "a<b". In that case, the data URL is
+    still found in the quoted value, but without the original URL from a data-savepage-* attribute before it.
+    """
+    # Comments and raw text elements change how everything after them has to be interpreted. Therefore,
+    # they must not be skipped, so that DATA_URL_CANDIDATE_REGEX can skip over them correctly.
+    if opening := LEXICAL_STATE_REGEX.search(data, position, hit):
+        return opening.start()
+
+    tag_start = hit
+    while (tag_start := data.rfind(b'<', position, tag_start)) >= 0:
+        if data[tag_start + 1 : tag_start + 2].isalpha():
+            return tag_start
+    return position
+
+
+def _find_original_url(data: Union[bytes, mmap.mmap], url_start: int, encoding: str) -> str:
+    """
+    Looks back for a comment right before url( containing the original URL. This is much cheaper than
+    an optional group in front of url( in the regex, which would be tried at every position.
+    """
+    if url_start < 2 or data[url_start - 2 : url_start] != b'*/':
+        return ""
+    comment_start = data.rfind(b'*', 0, url_start - 2) - 1
+    if comment_start < 0 or data[comment_start : comment_start + len(SAVEPAGE_URL_COMMENT)] != SAVEPAGE_URL_COMMENT:
+        return ""
+    return data[comment_start + len(SAVEPAGE_URL_COMMENT) : url_start - 2].decode(encoding, errors='replace')
+
+
+def _find_data_urls_in_text(
+    data: Union[bytes, mmap.mmap], start: int, end: int, encoding: str
+) -> list[tuple[str, int, int]]:
+    """Returns the original URLs and the spans of all data URLs in text, e.g., in scripts and style sheets."""
+    results: list[tuple[str, int, int]] = []
+    hit = start
+    while (hit := data.find(b'data:', hit, end)) >= 0:
+        # Data URLs in text directly follow a quote or url(, which is much faster to check than searching with
+        # the regex over the possibly large script or style sheet.
+        for candidate in (hit - 1, hit - 4):
+            match = DATA_URL_IN_TEXT_REGEX.match(data, candidate, end) if candidate >= start else None
+            if match and match.lastgroup:
+                original_url = _find_original_url(data, match.start(), encoding) if match.lastgroup == 'css' else ""
+                results.append((original_url, *match.span(match.lastgroup)))
+                hit = match.end()
+                break
+        else:
+            hit += 5
+    return results
+
+
+def _find_data_urls(data: Union[bytes, mmap.mmap], encoding: str) -> list[tuple[str, int, int]]:
+    """Returns the original URLs and the spans of all data URLs found in the given HTML."""
+    results: list[tuple[str, int, int]] = []
+    position = 0
+    # If one comment is unterminated, then all following ones are, too. Remember it to not search again and again.
+    has_comment_ends = True
+    hit = -1
+    while True:
+        # The next literal only has to be searched again after it has been passed. This avoids quadratic runtime
+        # when skipping many comment starts before it.
+        if hit < position and (hit := _find_data_literal(data, position)) < 0:
+            break
+
+        match = DATA_URL_CANDIDATE_REGEX.search(data, _find_scan_start(data, position, hit))
+        if not match:
+            break
+
+        position = match.end()
+        # The last closed group is the outermost named group of the matched branch.
+        group = match.lastgroup
+        assert group
+        if group == 'comment':
+            comment_end = data.find(b'-->', position) if has_comment_ends else -1
+            if comment_end >= 0:
+                position = comment_end + 3
+            else:
+                has_comment_ends = False
             continue
 
-        fileobj.seek(start)
-        data = fileobj.read(end - start)
-        span = _find_tag_attribute_spans(data, file.attribute)
-        if span[1] <= span[0]:
+        if group == 'tag':
+            attributes, position = _find_data_url_attributes(data, position, encoding)
+            results.extend(attributes)
+            continue
+
+        if group == 'raw_text':
+            attributes, position = _find_data_url_attributes(data, position, encoding)
+            results.extend(attributes)
+
+            # Self-closing start tags, e.g., <script/>, have no contents.
+            tag_end = data.find(b'>', position)
+            if tag_end < 0 or data[tag_end - 1 : tag_end] == b'/':
+                continue
+
+            # Unterminated raw text elements extend to the end of the file like for HTMLParser.
+            raw_text_end = RAW_TEXT_END_REGEXES[match.group('raw_text')[1:].lower()].search(data, tag_end + 1)
+            position = raw_text_end.start() if raw_text_end else len(data)
+            results.extend(_find_data_urls_in_text(data, tag_end + 1, position, encoding))
             continue
 
-        # Also convert the adjustments from character offsets to byte offsets.
-        # This also has the side effecft that it converts them from relative offsets based on 'start'
-        # to absolute offsets.
-        fileobj.seek(start)
-        fileobj.read(span[0])
-        bytes_start = fileobj.tell()
-        fileobj.read(span[1] - span[0])
-        bytes_end = fileobj.tell()
+        original_url = _find_original_url(data, match.start(), encoding) if group == 'css' else ""
+        results.append((original_url, *match.span(group)))
+
+    return results
+
+
+@functools.lru_cache(maxsize=256)
+def _guess_extension(mime_type: str) -> str:
+    """Memoized because embedded files of one HTML often share only a handful of MIME types."""
+    # https://github.com/python/cpython/issues/97646
+    # There seems to be some issue with application/javascript and text/javascript.
+    # The latter returns .js for Python 3.12+ but .es for prior versions.
+    if mime_type.endswith('/javascript'):
+        return '.js'
+    return mimetypes.guess_extension(mime_type) or ""
 
-        files.append(EmbeddedFile(original_url=file.original_url, span=(bytes_start, bytes_end)))
 
-    return files
+@dataclass
+class EmbeddedFile:
+    # byte offsets of the data URL inside the HTML file
+    original_url: str
+    span: tuple[int, int]
+
+
+def _memory_map(fileobj: IO[bytes]) -> Optional[mmap.mmap]:
+    """
+    Returns a read-only memory map of the whole file or None if it cannot be mapped. Only plain files are
+    memory-mapped because file objects of compressed streams, e.g., gzip.GzipFile, may return the file
+    descriptor of the underlying compressed file in 'fileno'.
+    """
+    if isinstance(getattr(fileobj, 'raw', fileobj), io.FileIO):
+        with contextlib.suppress(OSError, ValueError):  # Empty files cannot be mapped.
+            return mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+    return None
+
+
+@contextlib.contextmanager
+def _map_file(fileobj: IO[bytes]) -> Iterator[Union[bytes, mmap.mmap]]:
+    """
+    Yields the whole file contents. Plain files are memory-mapped in order to avoid copying everything into
+    a bytes object first.
+    """
+    mapped = _memory_map(fileobj)
+    if mapped is None:
+        fileobj.seek(0)
+        yield fileobj.read()
+        return
+
+    with mapped:
+        yield mapped
+
+
+def gather_embedded_files(fileobj: IO[bytes], encoding: str = tarfile.ENCODING) -> list[EmbeddedFile]:
+    # Scanning the raw bytes directly yields byte offsets, which can be used for seeking. The encoding is
+    # only necessary to decode the original URLs. All syntax relevant for finding data URLs is ASCII.
+    with _map_file(fileobj) as data:
+        return [
+            EmbeddedFile(original_url=original_url, span=(start, end))
+            for original_url, start, end in _find_data_urls(data, encoding)
+        ]
 
 
 class HTMLMountSource(SQLiteIndexMountSource):
     def __init__(self, fileOrPath: Union[str, IO[bytes]], encoding: str = tarfile.ENCODING, **options):
         self.mtime = os.stat(fileOrPath).st_mtime if isinstance(fileOrPath, str) else time.time()
 
-        # html.parser seems to be very lenient. Therefore, check manually and hope that the check is lenient enough.
-        with open(fileOrPath, 'rb') if isinstance(fileOrPath, str) else fileOrPath as file:
-            if not is_html_file(file):
-                raise ValueError("Not a valid HTML file!")
+        self.fileObject = open(fileOrPath, 'rb') if isinstance(fileOrPath, str) else fileOrPath
+
+        # The data URL scanner is very lenient. Therefore, check manually and hope that the check is lenient enough.
+        if not is_html_file(self.fileObject):
+            if isinstance(fileOrPath, str):
+                self.fileObject.close()
+            raise ValueError("Not a valid HTML file!")
 
         self.fileObjectLock = threading.Lock()
-        self.fileObject = (
-            open(fileOrPath, encoding=encoding)  # open in text mode!
-            if isinstance(fileOrPath, str)
-            else io.TextIOWrapper(fileOrPath, encoding=encoding)
-        )
+        # Slicing a memory map does not depend on a shared file position. Therefore, it is thread-safe without
+        # a lock, which makes it possible to serve concurrent reads of different embedded files in parallel.
+        self.mappedFile = _memory_map(self.fileObject)
+        self.encoding = encoding
 
         indexOptions = {
             'archiveFilePath': fileOrPath if isinstance(fileOrPath, str) else None,
@@ -443,24 +506,35 @@ class HTMLMountSource(SQLiteIndexMountSource):
             'encoding': encoding,
         }
         super().__init__(**(options | indexOptions))
-        self._finalize_index(
-            lambda: self.index.set_file_infos(
-                [self._convert_to_row(file) for file in gather_embedded_files(self.fileObject)]
-            )
-        )
+        self._finalize_index(self._create_index)
+
+    def _create_index(self) -> None:
+        # Scan the existing memory map instead of mapping the file a second time.
+        if self.mappedFile is None:
+            embeddedFiles = gather_embedded_files(self.fileObject, self.encoding)
+        else:
+            embeddedFiles = [
+                EmbeddedFile(original_url=original_url, span=(start, end))
+                for original_url, start, end in _find_data_urls(self.mappedFile, self.encoding)
+            ]
+
+        # Insert rows in bounded chunks like the other backends instead of building one list of all rows.
+        fileInfos = []
+        for file in embeddedFiles:
+            fileInfos.append(self._convert_to_row(file))
+            if len(fileInfos) > 1000:
+                self.index.set_file_infos(fileInfos)
+                fileInfos = []
+
+        if fileInfos:
+            self.index.set_file_infos(fileInfos)
 
     def _convert_to_row(self, file: EmbeddedFile):
         url_file = self._open_with_span(file.span[0], file.span[1])
         contents = url_file.read()
 
         virtual_path = file.original_url
-        # https://github.com/python/cpython/issues/97646
-        # There seems to be some issue with application/javascript and text/javascript.
-        # The latter returns .js for Python 3.12+ but .es for prior versions.
-        if url_file.mime_type.endswith('/javascript'):
-            extension = '.js'
-        else:
-            extension = mimetypes.guess_extension(url_file.mime_type) or ""
+        extension = _guess_extension(url_file.mime_type)
         if not virtual_path or virtual_path.startswith('data:'):
             virtual_path = hashlib.sha256(contents).hexdigest() + extension
         if os.path.splitext(virtual_path)[1].lower() != extension.lower():
@@ -495,9 +569,12 @@ class HTMLMountSource(SQLiteIndexMountSource):
         if end <= start:
             return DataURLFile()
 
+        if self.mappedFile is not None:
+            return DataURLFile(self.mappedFile[start:end], self.encoding)
+
         with self.fileObjectLock:
             self.fileObject.seek(start)
-            return DataURLFile(self.fileObject.read(end - start))
+            return DataURLFile(self.fileObject.read(end - start), self.encoding)
 
     @overrides(SQLiteIndexMountSource)
     def open(self, fileInfo: FileInfo, buffering: int = -1) -> IO[bytes]:
@@ -507,6 +584,8 @@ class HTMLMountSource(SQLiteIndexMountSource):
     @overrides(SQLiteIndexMountSource)
     def close(self) -> None:
         super().close()
+        if mappedFile := getattr(self, 'mappedFile', None):
+            mappedFile.close()
         if lock := getattr(self, 'fileObjectLock', None):
             with lock:
                 if fobj := getattr(self, 'fileObject', None):
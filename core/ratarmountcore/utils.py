@@ -197,12 +197,16 @@ def format_number(i: int, base: str, length: int = 0):
     if len(base) <= 1:
         raise ValueError("Base alphabet must contain more than one letter!")
 
-    result = ''
-    while i > 0 or length > 0 or not result:
-        result += base[i % len(base)]
-        i = i // len(base)
-        length = length - 1
-    return result[::-1]
+    radix = len(base)
+    # The first digit is always emitted, even for i = 0. Prepending avoids the reversal at the end.
+    result = base[i % radix]
+    i //= radix
+    length -= 1
+    while i > 0 or length > 0:
+        result = base[i % radix] + result
+        i //= radix
+        length -= 1
+    return result
 
 
 def distribution_contains_file(distribution, path: str) -> bool:
@@ -4,6 +4,7 @@
 # pylint: disable=wrong-import-position
 
 import hashlib
+import io
 import os
 import stat
 import sys
@@ -96,9 +97,21 @@ ARCHIVES = [
 ]
 
 
+def open_archive(path: str, openMode: str):
+    if openMode == 'path':
+        return ARMountSource(path)
+    with open(path, 'rb') as file:
+        data = file.read()
+    if openMode == 'bytesio':
+        return ARMountSource(io.BytesIO(data))
+    # BufferedReader over a non-FileIO raw stream cannot be memory-mapped and falls back to seek and read.
+    return ARMountSource(io.BufferedReader(io.BytesIO(data)))
+
+
+@pytest.mark.parametrize("openMode", ['path', 'bytesio', 'stream'])
 @pytest.mark.parametrize("archive", ARCHIVES)
-def test_ar_archives(archive):
-    with ARMountSource(find_test_file(archive[0])) as mountSource:
+def test_ar_archives(archive, openMode):
+    with open_archive(find_test_file(archive[0]), openMode) as mountSource:
         for folder in ['/']:
             fileInfo = mountSource.lookup(folder)
             assert fileInfo
@@ -122,3 +135,37 @@ def test_ar_archives(archive):
                         assert file.read() == content
                     else:
                         assert hashlib.md5(file.read()).hexdigest() == content
+
+
+def create_ar_member(name: bytes, data: bytes) -> bytes:
+    header = b''.join(
+        [
+            name.ljust(16),
+            b'0'.ljust(12),
+            b'0'.ljust(6),
+            b'0'.ljust(6),
+            b'644'.ljust(8),
+            str(len(data)).encode().ljust(10),
+        ]
+    )
+    return header + b'`\n' + data + (b'\n' if len(data) % 2 else b'')
+
+
+def test_ar_gnu_long_names_after_members():
+    long_name = b'a-very-long-file-name-over-16-characters.txt'
+    archive = b''.join(
+        [
+            b'!<arch>\n',
+            create_ar_member(b'short/', b'foo\n'),
+            create_ar_member(b'/0', b'bar\n'),
+            create_ar_member(b'after/', b'baz\n'),
+            create_ar_member(b'//', long_name + b'/\n'),
+        ]
+    )
+    with ARMountSource(io.BytesIO(archive)) as mountSource:
+        assert set(mountSource.list('/')) == {'short', long_name.decode(), 'after'}
+        for path, content in [('/short', b'foo\n'), ('/' + long_name.decode(), b'bar\n'), ('/after', b'baz\n')]:
+            fileInfo = mountSource.lookup(path)
+            assert fileInfo
+            with mountSource.open(fileInfo) as file:
+                assert file.read() == content
@@ -0,0 +1,54 @@
+# pylint: disable=wrong-import-order
+# pylint: disable=wrong-import-position
+
+import os
+import stat
+import sys
+
+from helpers import copy_test_file
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ratarmountcore.mountsource.formats.fat import FATMountSource
+
+
+class TestFATMountSource:
+    @staticmethod
+    def test_simple_usage():
+        with copy_test_file('folder-symlink.fat12') as path, FATMountSource(path) as mountSource:
+            for folder, name in [('/', 'foo'), ('/foo', 'fighter')]:
+                fileInfo = mountSource.lookup(folder)
+                assert fileInfo
+                assert stat.S_ISDIR(fileInfo.mode)
+
+                assert mountSource.exists(folder)
+                assert mountSource.list(folder) == [name]
+
+                modes = mountSource.list_mode(folder)
+                assert modes
+                assert list(modes) == [name]
+                assert stat.S_ISDIR(modes[name])
+
+            modes = mountSource.list_mode('/foo/fighter')
+            assert modes
+            assert list(modes) == ['ufo']
+            assert stat.S_ISREG(modes['ufo'])
+
+            filePath = '/foo/fighter/ufo'
+            fileInfo = mountSource.lookup(filePath)
+            assert fileInfo
+            assert stat.S_ISREG(fileInfo.mode)
+            assert fileInfo.size == 6
+            assert mountSource.exists(filePath)
+            assert mountSource.list(filePath) is None
+            assert mountSource.list_mode(filePath) is None
+
+            with mountSource.open(fileInfo) as file:
+                assert file.read() == b'iriya\n'
+
+            # Paths below a file or missing paths do not exist and must not raise.
+            for missingPath in ['/foo/fighter/ufo/x', '/foo/jet', '/nope']:
+                assert not mountSource.exists(missingPath)
+                assert mountSource.lookup(missingPath) is None
+                assert mountSource.list(missingPath) is None
+                assert mountSource.list_mode(missingPath) is None
@@ -6,6 +6,7 @@ import io
 import os
 import stat
 import sys
+import time
 
 import pytest
 from helpers import copy_test_file
@@ -37,7 +38,7 @@ class TestHTMLDataURLParser:
     @pytest.mark.parametrize('i_html', list(range(len(HTML_FILES_WITH_SINGLE_DATA_URL))))
     def test_base64(self, i_html):
         data_url = "data:image/webp;base64,UklGRiQAAABXRUJQVlA4IBgAAAAwAQCdASoBAAEAAQAcJaQAA3AA/v3AgAA="
-        html_file = io.StringIO(HTML_FILES_WITH_SINGLE_DATA_URL[i_html].format(data_url))
+        html_file = io.BytesIO(HTML_FILES_WITH_SINGLE_DATA_URL[i_html].format(data_url).encode())
 
         files = gather_embedded_files(html_file)
         assert len(files) == 1
@@ -46,7 +47,7 @@ class TestHTMLDataURLParser:
 
         html_file.seek(embedded_file.span[0])
         extracted_data_url = html_file.read(embedded_file.span[1] - embedded_file.span[0])
-        assert extracted_data_url == data_url
+        assert extracted_data_url == data_url.encode()
 
         file = DataURLFile(extracted_data_url)
         assert file.mime_type == 'image/webp'
@@ -56,7 +57,7 @@ class TestHTMLDataURLParser:
     @pytest.mark.parametrize('i_html', list(range(len(HTML_FILES_WITH_SINGLE_DATA_URL))))
     def test_utf8(self, i_html):
         data_url = "data:text/css;utf8,body {&#37;20font-family: Arial, sans-serif };"
-        html_file = io.StringIO(HTML_FILES_WITH_SINGLE_DATA_URL[i_html].format(data_url))
+        html_file = io.BytesIO(HTML_FILES_WITH_SINGLE_DATA_URL[i_html].format(data_url).encode())
 
         files = gather_embedded_files(html_file)
         assert len(files) == 1
@@ -65,7 +66,7 @@ class TestHTMLDataURLParser:
 
         html_file.seek(embedded_file.span[0])
         extracted_data_url = html_file.read(embedded_file.span[1] - embedded_file.span[0])
-        assert extracted_data_url == data_url
+        assert extracted_data_url == data_url.encode()
 
         file = DataURLFile(extracted_data_url)
         assert file.mime_type == 'text/css'
@@ -73,6 +74,94 @@ class TestHTMLDataURLParser:
         assert not file.is_base64
         assert file.read() == b"body { font-family: Arial, sans-serif };"
 
+    @pytest.mark.parametrize(
+        'html_file',
+        [
+            # '<!--' does not start a comment inside raw text elements.
+            '<script>var s="<!--";</script><img src="{}">',
+            '<style>/* <!-- */ a{{background:url({})}}</style>',
+            '<script>var s="<!--";</script><img src="{}"><!-- comment -->',
+            # Unterminated comments should not hide all following data URLs.
+            '<p>Unterminated <!-- comment</p><img src="{}">',
+        ],
+    )
+    def test_comment_start_without_comment(self, html_file):
+        data_url = "data:text/plain;base64,SGVsbG8="
+        html_data = html_file.format(data_url).encode()
+        start = html_data.index(data_url.encode())
+        assert [file.span for file in gather_embedded_files(io.BytesIO(html_data))] == [(start, start + len(data_url))]
+
+    @pytest.mark.parametrize(
+        ('html_file', 'original_url'),
+        [
+            ('<p>text</p><img src="{}">', ''),
+            ('<!-- <img src="data:text/plain,Commented"> --><img src="{}">', ''),
+            ('<style>p{{background:/*savepage-url=/a.png*/url({})}}</style>', '/a.png'),
+            ('<p>/*savepage-url=/a.png*/url({})</p>', '/a.png'),
+            ('<img data-savepage-src="/a.png" src="{}">', '/a.png'),
+            ('<img src="{}" data-savepage-src="/a.png">', '/a.png'),
+            ('<IMG DATA-SAVEPAGE-SRC="/a.png" SRC="{}">', '/a.png'),
+            ('<svg><image xlink:href="{}"/></svg>', ''),
+            ('<img alt="a > b" data-savepage-src="/a.png" src="{}">', '/a.png'),
+            ('<img data-savepage-src="/a.png" alt="a > b" src="{}">', '/a.png'),
+            ("<img alt='a > b' data-savepage-src='/a.png' src='{}'>", '/a.png'),
+        ],
+    )
+    def test_original_url(self, html_file, original_url):
+        data_url = "data:text/plain;base64,SGVsbG8="
+        html_data = html_file.format(data_url).encode()
+        start = html_data.index(data_url.encode())
+
+        files = gather_embedded_files(io.BytesIO(html_data))
+        assert len(files) == 1
+        assert files[0].original_url == original_url
+        assert files[0].span == (start, start + len(data_url))
+
+    @staticmethod
+    def test_character_reference():
+        data_url = b"data&#58;text/plain;base64,SGVsbG8="
+        html_data = b'<img src="' + data_url + b'">'
+        start = html_data.index(data_url)
+        assert [file.span for file in gather_embedded_files(io.BytesIO(html_data))] == [(start, start + len(data_url))]
+        assert DataURLFile(data_url).read() == b'Hello'
+
+    @pytest.mark.parametrize(
+        'html_data',
+        [
+            b'<p>"data:' + b'/' * 20000 + b'x</p>',
+            b'<script>' + b'if(a<b)c();' * 20000 + b' data: </script>',
+            b'<style>url(data:' + b'a/' * 20000 + b'</style>',
+            b"<a '" * 20000 + b'"data:text/plain,Hello"',
+            b'<a x="' * 20000 + b'data:text/plain,Hello"',
+            b'a < b ' * 20000 + b'"data:text/plain,Hello"',
+            b'<!--' * 20000 + b'"data:text/plain,Hello"',
+            b'<script>' * 20000 + b'"data:text/plain,Hello"',
+            b'<a data-x=1 ' * 20000 + b'src="data:text/plain,Hello"',
+        ],
+    )
+    def test_adversarial_input(self, html_data):
+        # All of these took seconds to minutes with quadratic scanning or catastrophic regex backtracking.
+        t0 = time.time()
+        files = gather_embedded_files(io.BytesIO(html_data))
+        assert time.time() - t0 < 1
+        for file in files:
+            assert html_data[file.span[0] : file.span[1]].startswith(b'data:')
+
+    @pytest.mark.parametrize(
+        'data_url',
+        [
+            b'data:text/plain;name=hello.txt,Hello',
+            'data:text/plain;name=ü,Hello'.encode(),
+            'data:text/plain;name=€€,Hello'.encode(),
+            'data:text/plain;name=€€;base64,SGVsbG8='.encode(),
+            b'data:text/plain;name=\xff\xfe,Hello',
+            b'data:text/plain;name=&euro;,Hello',
+        ],
+    )
+    def test_non_ascii_parameters(self, data_url):
+        assert DataURLFile(data_url).read() == b'Hello'
+        assert DataURLFile(data_url.decode(errors='replace')).read() == b'Hello'
+
     @staticmethod
     def test_medium_html():
         files = [
@@ -108,3 +197,40 @@ class TestHTMLDataURLParser:
                 assert not mountSource.list(path)
                 with mountSource.open(fileInfo) as file:
                     assert hashlib.md5(file.read()).hexdigest() == md5sum
+
+    @staticmethod
+    def test_file_object():
+        with (
+            copy_test_file('save_page_we.html') as path,
+            open(path, 'rb') as file,
+            HTMLMountSource(file) as mountSource,
+        ):
+            # The given file object must not be closed by the HTML file check.
+            assert not file.closed
+            fileInfo = mountSource.lookup("/https:/example.com/docs/readme.txt")
+            assert fileInfo
+            with mountSource.open(fileInfo) as embeddedFile:
+                assert hashlib.md5(embeddedFile.read()).hexdigest() == "835a667e70862458346dcd66a7d94db7"
+
+    @staticmethod
+    def test_memory_mapped_and_unmapped():
+        with copy_test_file('save_page_we.html') as path:
+            with open(path, 'rb') as file:
+                contents = file.read()
+
+            with HTMLMountSource(path) as mappedSource, HTMLMountSource(io.BytesIO(contents)) as unmappedSource:
+                assert mappedSource.mappedFile is not None
+                assert unmappedSource.mappedFile is None
+
+                files = mappedSource.list('/https:/example.com')
+                assert files
+                assert files.keys() == unmappedSource.list('/https:/example.com').keys()
+                for name in files:
+                    mappedInfo = mappedSource.lookup('/https:/example.com/' + name)
+                    unmappedInfo = unmappedSource.lookup('/https:/example.com/' + name)
+                    assert mappedInfo
+                    assert unmappedInfo
+                    if stat.S_ISDIR(mappedInfo.mode):
+                        continue
+                    with mappedSource.open(mappedInfo) as mapped, unmappedSource.open(unmappedInfo) as unmapped:
+                        assert mapped.read() == unmapped.read()
@@ -37,6 +37,14 @@ class TestSQLiteIndexedTarParallelized:
         assert normpath("../") == "/"
         assert normpath("../.././..") == "/"
 
+        # Already normalized paths and paths that only look like them.
+        assert normpath("/a/b") == "/a/b"
+        assert normpath("/a/.b/..c") == "/a/.b/..c"
+        assert normpath("/a/./b") == "/a/b"
+        assert normpath("/a/../b") == "/b"
+        assert normpath("/a/b/.") == "/a/b"
+        assert normpath("/a/b/..") == "/a"
+
     @staticmethod
     def test_query_normpath():
         normpath = SQLiteIndex._query_normpath
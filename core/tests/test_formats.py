@@ -32,27 +32,40 @@ from ratarmountcore.mountsource.factory import find_backends_by_extension
 def test_format_detection():
     # This test assumes that we use correct extensions for all files in the tests folder.
     folder = os.path.dirname(find_test_file("tests/single-file.tar"))
-    for name in os.listdir(folder):
-        path = os.path.join(folder, name)
-        if not os.path.isfile(path):
+
+    extensionsByFormat = {}
+    for formatID, formatInfo in FILE_FORMATS.items():
+        extensions = set(formatInfo.extensions)
+        if formatID in COMPRESSION_FORMATS:
+            extensions.update({'t' + e for e in extensions})
+        if formatID == FileFormatID.RATARMOUNT_INDEX:
+            extensions.add('sqlite')
+        extensionsByFormat[formatID] = extensions
+
+    isBackendAvailable = {}
+    for backend, backendInfo in ARCHIVE_BACKENDS.items():
+        modules = backendInfo.requiredModules
+        isBackendAvailable[backend] = all(module in sys.modules for module, _ in modules)
+        if not isBackendAvailable[backend]:
+            print(f"Ignoring tests for: {backend} because required modules are missing: {modules}")
+
+    for entry in os.scandir(folder):
+        if not entry.is_file():
             continue
 
-        with open(path, 'rb') as file:
+        name = entry.name
+        with open(entry.path, 'rb') as file:
             # The caching should not change the results!
             formats = detect_formats(file)
-            assert formats == {fid for fid, info in FILE_FORMATS.items() if might_be_format(file, info)}, name
             assert formats == {fid for fid in FILE_FORMATS if might_be_format(file, fid)}, name
+            # Passing the format info instead of the ID should be equivalent. Only check the detected formats
+            # in order to not probe all formats twice.
+            assert all(might_be_format(file, FILE_FORMATS[fid]) for fid in formats), name
 
             # Skip tests for which backends are not installed to test on some broken systems.
             backends = find_backends_by_extension(name)
             assert all(backend in ARCHIVE_BACKENDS for backend in backends)
-            hasBackend = True
-            for backend in backends:
-                modules = ARCHIVE_BACKENDS[backend].requiredModules
-                if modules and not all(module in sys.modules for module, _ in modules):
-                    hasBackend = False
-                    print(f"Ignoring test for: {backend} because required modules are missing: {modules}")
-                    break
+            hasBackend = all(isBackendAvailable[backend] for backend in backends)
             if 'encrypted' in name and name.endswith('.sqlar') and sqlcipher3 is None:
                 hasBackend = False
             if not hasBackend:
@@ -87,13 +100,7 @@ def test_format_detection():
                 elif len(formats) == 0:
                     assert extension in ['001', '002', 'ini', 'sh', 'snar', 'txt', 'py'], message
                 elif len(formats) == 1:
-                    formatID = next(iter(formats))
-                    extensions = set(FILE_FORMATS[formatID].extensions)
-                    if formatID in COMPRESSION_FORMATS:
-                        extensions.update({'t' + e for e in extensions})
-                    if formatID == FileFormatID.RATARMOUNT_INDEX:
-                        extensions.add('sqlite')
-                    assert extension in extensions, message
+                    assert extension in extensionsByFormat[next(iter(formats))], message
                 elif len(formats) > 1:
                     # SQLite files can be Ratarmount indexes or SQLAR
                     # EXT4 images can be interpreted as TAR files (with only zero blocks at the start).
@@ -3,12 +3,15 @@
 # pylint: disable=wrong-import-position
 # pylint: disable=protected-access
 
+import contextlib
 import io
 import os
 import stat
 import sys
 import tarfile
 
+import pytest
+
 if __name__ == '__main__' or __package__ is not None:
     sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../core')))
 
@@ -27,11 +30,107 @@ def create_file(tarArchive, fileName, contents):
 def make_folder(tarArchive, folderName):
     tinfo = tarfile.TarInfo(folderName)
     tinfo.type = tarfile.DIRTYPE
-    tarArchive.addfile(tinfo, io.BytesIO())
+    tarArchive.addfile(tinfo)
+
+
+TEST_KWARGS_KINDS = ["file paths", "file objects", "file objects with no fileno"]
+
+
+@contextlib.contextmanager
+def open_tar_kwargs(tar_path, kind):
+    """Opens the archive only for the requested kind of input so that no file handle is leaked."""
+    if kind == "file paths":
+        yield {'fileObject': None, 'tarFileName': tar_path}
+        return
+
+    with open(tar_path, "rb") as file:
+        fileObject = io.BytesIO(file.read()) if kind == "file objects with no fileno" else file
+        yield {'fileObject': fileObject, 'tarFileName': "tarFileName"}
+
+
+EXPECTED_LIST_DIST_A = {
+    'b': FileInfo(
+        size=0,
+        mtime=0,
+        mode=16804,
+        linkname='',
+        uid=0,
+        gid=0,
+        userdata=[
+            SQLiteIndexedTarUserData(
+                offsetheader=3584,
+                offset=4096,
+                istar=0,
+                issparse=0,
+                isgenerated=False,
+                recursiondepth=1,
+            )
+        ],
+    )
+}
+
+EXPECTED_LIST_ROOT = {
+    'README.md': FileInfo(
+        size=11,
+        mtime=0,
+        mode=33188,
+        linkname='',
+        uid=0,
+        gid=0,
+        userdata=[
+            SQLiteIndexedTarUserData(
+                offsetheader=0,
+                offset=512,
+                istar=0,
+                issparse=0,
+                isgenerated=False,
+                recursiondepth=1,
+            )
+        ],
+    ),
+    'dist': FileInfo(
+        size=0,
+        mtime=0,
+        mode=16804,
+        linkname='',
+        uid=0,
+        gid=0,
+        userdata=[
+            SQLiteIndexedTarUserData(
+                offsetheader=2560,
+                offset=3072,
+                istar=0,
+                issparse=0,
+                isgenerated=False,
+                recursiondepth=1,
+            )
+        ],
+    ),
+    'src': FileInfo(
+        size=0,
+        mtime=0,
+        mode=16804,
+        linkname='',
+        uid=0,
+        gid=0,
+        userdata=[
+            SQLiteIndexedTarUserData(
+                offsetheader=1024,
+                offset=1536,
+                istar=0,
+                issparse=0,
+                isgenerated=False,
+                recursiondepth=1,
+            )
+        ],
+    ),
+}
 
 
-def test_example(tmpdir):
-    tar_path = os.path.join(tmpdir, "archive.tar.gz")
+@pytest.fixture(scope="module")
+def indexed_archive(tmp_path_factory):
+    """Creates the archive and its index only once because all test variants can read the same index."""
+    tar_path = os.path.join(tmp_path_factory.mktemp("archive"), "archive.tar.gz")
     index_path = tar_path + ".index.sqlite"
     with tarfile.open(name=tar_path, mode="w:gz") as tarFile:
         create_file(tarFile, "./README.md", "hello world")
@@ -44,28 +143,26 @@ def test_example(tmpdir):
 
     print("Created temp tar:", tar_path)
 
-    testKwargs: dict[str, dict] = {
-        "file paths": {'fileObject': None, 'tarFileName': tar_path},
-        "file objects": {'fileObject': open(tar_path, "rb"), 'tarFileName': "tarFileName"},
-        "file objects with no fileno": {
-            'fileObject': io.BytesIO(open(tar_path, "rb").read()),
-            'tarFileName': "tarFileName",
-        },
-    }
+    # Create index
+    with SQLiteIndexedTar(
+        tarFileName=tar_path,
+        writeIndex=True,
+        clearIndexCache=True,
+        indexFilePath=index_path,
+        printDebug=3,
+    ):
+        pass
 
-    for name, kwargs in testKwargs.items():
-        print(f"\n== Test with {name} ==")
+    return tar_path, index_path
 
-        # Create index
-        with SQLiteIndexedTar(
-            **kwargs,
-            writeIndex=True,
-            clearIndexCache=True,
-            indexFilePath=index_path,
-            printDebug=3,
-        ):
-            pass
 
+@pytest.mark.parametrize("kind", TEST_KWARGS_KINDS)
+def test_example(indexed_archive, kind):
+    tar_path, index_path = indexed_archive
+
+    print(f"\n== Test with {kind} ==")
+
+    with open_tar_kwargs(tar_path, kind) as kwargs:
         # Read from index
         indexedFile = SQLiteIndexedTar(
             **kwargs,
@@ -81,90 +178,16 @@ def test_example(tmpdir):
 
         finfo = indexedFile.lookup("/dist/a")
         assert stat.S_ISDIR(finfo.mode)
-        assert indexedFile.list("/dist/a") == {
-            'b': FileInfo(
-                size=0,
-                mtime=0,
-                mode=16804,
-                linkname='',
-                uid=0,
-                gid=0,
-                userdata=[
-                    SQLiteIndexedTarUserData(
-                        offsetheader=3584,
-                        offset=4096,
-                        istar=0,
-                        issparse=0,
-                        isgenerated=False,
-                        recursiondepth=1,
-                    )
-                ],
-            )
-        }
-
-        assert indexedFile.list("/") == {
-            'README.md': FileInfo(
-                size=11,
-                mtime=0,
-                mode=33188,
-                linkname='',
-                uid=0,
-                gid=0,
-                userdata=[
-                    SQLiteIndexedTarUserData(
-                        offsetheader=0,
-                        offset=512,
-                        istar=0,
-                        issparse=0,
-                        isgenerated=False,
-                        recursiondepth=1,
-                    )
-                ],
-            ),
-            'dist': FileInfo(
-                size=0,
-                mtime=0,
-                mode=16804,
-                linkname='',
-                uid=0,
-                gid=0,
-                userdata=[
-                    SQLiteIndexedTarUserData(
-                        offsetheader=2560,
-                        offset=3072,
-                        istar=0,
-                        issparse=0,
-                        isgenerated=False,
-                        recursiondepth=1,
-                    )
-                ],
-            ),
-            'src': FileInfo(
-                size=0,
-                mtime=0,
-                mode=16804,
-                linkname='',
-                uid=0,
-                gid=0,
-                userdata=[
-                    SQLiteIndexedTarUserData(
-                        offsetheader=1024,
-                        offset=1536,
-                        istar=0,
-                        issparse=0,
-                        isgenerated=False,
-                        recursiondepth=1,
-                    )
-                ],
-            ),
-        }
+        assert indexedFile.list("/dist/a") == EXPECTED_LIST_DIST_A
+
+        assert indexedFile.list("/") == EXPECTED_LIST_ROOT
 
         finfo = indexedFile.lookup("/README.md")
         assert finfo.size == 11
         assert indexedFile.read(finfo, size=11, offset=0) == b"hello world"
         assert indexedFile.read(finfo, size=3, offset=3) == b"lo "
 
-        # Needs to be properly closed so that the index can be removed on Windows in the next loop iteration.
+        # Needs to be properly closed so that the temporary folder can be removed on Windows.
         indexedFile.close()
         # Second close should simply result in a no-op
         indexedFile.close()